@@ -9,7 +9,11 @@ CCMHA Change Monitoring Workflow
 import os
 import sys
 import logging
-import subprocess
+from typing import Callable
+
+from ccmha_complete_scraper import run as run_scraper
+from ccmha_change_detector import run as run_detector
+from ccmha_change_notifier import run as run_notifier
 
 logging.basicConfig(
     level=logging.INFO,
@@ -19,40 +23,21 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def run_script(script_name: str, description: str) -> int:
-    """Run a Python script and return exit code"""
+def run_step(step: Callable[[], int], description: str) -> int:
+    """Run a workflow step in-process and return its exit code"""
     logger.info("="*60)
     logger.info(f"Executing: {description}")
     logger.info("="*60)
 
     try:
-        result = subprocess.run(
-            [sys.executable, script_name],
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
-
-        # Print output
-        if result.stdout:
-            for line in result.stdout.strip().split('\n'):
-                logger.info(f"{description} output: {line}")
-
-        if result.stderr:
-            for line in result.stderr.strip().split('\n'):
-                if line.strip():
-                    logger.warning(f"{description} stderr: {line}")
-
-        logger.info(f"{description} exit code: {result.returncode}")
-        return result.returncode
-
-    except subprocess.TimeoutExpired:
-        logger.error(f"{description} timed out after 120 seconds")
-        return 124
+        exit_code = step()
     except Exception as e:
         logger.error(f"{description} failed: {e}")
         return 1
 
+    logger.info(f"{description} exit code: {exit_code}")
+    return exit_code
+
 
 def main():
     """Main workflow"""
@@ -70,7 +55,7 @@ def main():
     os.environ['DAYS_AHEAD'] = '7'
     os.environ['CHANGE_MONITOR_DAYS'] = '7'
 
-    scraper_exit = run_script('ccmha_complete_scraper.py', 'Scraper')
+    scraper_exit = run_step(run_scraper, 'Scraper')
 
     if scraper_exit != 0:
         logger.error("✗ Scraper failed")
@@ -84,7 +69,7 @@ def main():
     logger.info("Step 2/3: Detecting changes...")
     logger.info("="*60)
 
-    detector_exit = run_script('ccmha_change_detector.py', 'Change Detector')
+    detector_exit = run_step(run_detector, 'Change Detector')
 
     if detector_exit == 0:
         logger.info("✓ No changes detected - monitoring complete")
@@ -104,7 +89,7 @@ def main():
     logger.info("Step 3/3: Sending change notification...")
     logger.info("="*60)
 
-    notifier_exit = run_script('ccmha_change_notifier.py', 'Change Notifier')
+    notifier_exit = run_step(run_notifier, 'Change Notifier')
 
     if notifier_exit != 0:
         logger.error("✗ Change notifier failed")
@@ -8,11 +8,13 @@ import os
 import sys
 import json
 import logging
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
-from datetime import datetime
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib json module
+    orjson = None
+
+from ccmha_html import render_changes_html
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,8 +31,9 @@ def load_changes(filepath: str) -> dict:
         return None
 
     try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        return orjson.loads(data) if orjson is not None else json.loads(data)
     except Exception as e:
         logger.error(f"Error loading changes: {e}")
         return None
@@ -38,127 +41,55 @@ def load_changes(filepath: str) -> dict:
 
 def format_changes_html(changes: dict) -> str:
     """Format changes into HTML for email"""
+    return render_changes_html(changes, inline_styles=False, include_html_wrapper=True)
 
-    if not changes or not changes.get('has_changes'):
-        return "<p>No changes detected.</p>"
-
-    html = """
-    <html>
-    <head>
-        <style>
-            body { font-family: Arial, sans-serif; }
-            h2 { color: #333; }
-            h3 { margin-top: 20px; }
-            table { border-collapse: collapse; width: 100%; margin-top: 10px; }
-            th { background-color: #4CAF50; color: white; padding: 8px; text-align: left; }
-            td { border: 1px solid #ddd; padding: 8px; }
-            tr:nth-child(even) { background-color: #f2f2f2; }
-            .added { background-color: #d4edda; }
-            .removed { background-color: #f8d7da; }
-            .modified { background-color: #fff3cd; }
-        </style>
-    </head>
-    <body>
-    """
-
-    html += f"<h2>🔔 CCMHA Schedule Changes Detected (Next 7 Days)</h2>"
-    html += f"<p><strong>Detected at:</strong> {datetime.now().strftime('%Y-%m-%d %I:%M %p')}</p>"
-
-    # Added items
-    if changes.get('added'):
-        html += "<h3 style='color: green;'>➕ New Ice Times Added</h3>"
-        html += "<table>"
-        html += "<tr><th>Date</th><th>Time</th><th>Type</th><th>League</th><th>Team</th><th>Venue</th></tr>"
-
-        for item in sorted(changes['added'], key=lambda x: (x['date'], x['start_time'])):
-            html += f"<tr class='added'>"
-            html += f"<td>{item['date']}</td>"
-            html += f"<td>{item['start_time']} - {item['end_time']}</td>"
-            html += f"<td>{item['type']}</td>"
-            html += f"<td>{item['league']}</td>"
-            html += f"<td>{item['team']}</td>"
-            html += f"<td>{item['venue']}</td>"
-            html += f"</tr>"
-        html += "</table>"
-
-    # Removed items
-    if changes.get('removed'):
-        html += "<h3 style='color: red;'>➖ Ice Times Cancelled/Removed</h3>"
-        html += "<table>"
-        html += "<tr><th>Date</th><th>Time</th><th>Type</th><th>League</th><th>Team</th><th>Venue</th></tr>"
-
-        for item in sorted(changes['removed'], key=lambda x: (x['date'], x['start_time'])):
-            html += f"<tr class='removed'>"
-            html += f"<td>{item['date']}</td>"
-            html += f"<td>{item['start_time']} - {item['end_time']}</td>"
-            html += f"<td>{item['type']}</td>"
-            html += f"<td>{item['league']}</td>"
-            html += f"<td>{item['team']}</td>"
-            html += f"<td>{item['venue']}</td>"
-            html += f"</tr>"
-        html += "</table>"
-
-    # Modified items
-    if changes.get('modified'):
-        html += "<h3 style='color: orange;'>🔄 Ice Times Modified</h3>"
-        html += "<table>"
-        html += "<tr><th>Date</th><th>Time</th><th>Type</th><th>League</th><th>Changes</th></tr>"
-
-        for mod in changes['modified']:
-            old_item = mod['old']
-            new_item = mod['new']
-
-            html += f"<tr class='modified'>"
-            html += f"<td>{new_item['date']}</td>"
-            html += f"<td>{new_item['start_time']} - {new_item['end_time']}</td>"
-            html += f"<td>{new_item['type']}</td>"
-            html += f"<td>{new_item['league']}</td>"
-
-            # Describe changes
-            changes_desc = []
-            if old_item.get('team') != new_item.get('team'):
-                changes_desc.append(f"<strong>Team:</strong> {old_item.get('team')} → {new_item.get('team')}")
-            if old_item.get('end_time') != new_item.get('end_time'):
-                changes_desc.append(f"<strong>End:</strong> {old_item.get('end_time')} → {new_item.get('end_time')}")
-            if old_item.get('venue') != new_item.get('venue'):
-                changes_desc.append(f"<strong>Venue:</strong> {old_item.get('venue')} → {new_item.get('venue')}")
-
-            html += f"<td>{'<br>'.join(changes_desc)}</td>"
-            html += f"</tr>"
-        html += "</table>"
-
-    # Summary
-    html += f"""
-    <div style='margin-top: 30px; padding: 15px; background-color: #f0f0f0; border-left: 4px solid #4CAF50;'>
-        <h3 style='margin-top: 0;'>Summary</h3>
-        <ul>
-            <li><strong>{len(changes.get('added', []))}</strong> ice times added</li>
-            <li><strong>{len(changes.get('removed', []))}</strong> ice times removed</li>
-            <li><strong>{len(changes.get('modified', []))}</strong> ice times modified</li>
-        </ul>
-    </div>
-    """
-
-    html += """
-    <p style='margin-top: 30px; color: #666; font-size: 12px;'>
-    This is an automated notification from the CCMHA Schedule Monitor.
-    Changes are checked at 12:30 PM, 4:30 PM, and 1:00 AM daily for the next 7 days.
-    </p>
-    </body>
-    </html>
-    """
-
-    return html
 
+class Notifier:
+    """SMTP session that stays open for the duration of a with-block"""
 
-def send_change_notification(changes: dict, recipients: list, smtp_config: dict):
-    """Send email notification about schedule changes"""
+    def __init__(self, smtp_config: dict):
+        self.smtp_config = smtp_config
+        self._server = None
+
+    def __enter__(self):
+        # Imported here so the common no-changes run never loads smtplib
+        import smtplib
+
+        logger.info(f"Connecting to {self.smtp_config['server']}:{self.smtp_config['port']}")
+        # Bounded so a stalled server can't hang the in-process monitor run
+        server = smtplib.SMTP(self.smtp_config['server'], self.smtp_config['port'], timeout=30)
+        try:
+            server.starttls()
+
+            logger.info("Logging in to SMTP server...")
+            server.login(self.smtp_config['sender'], self.smtp_config['password'])
+        except Exception:
+            server.close()
+            raise
+
+        self._server = server
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self._server.quit()
+        except Exception:
+            self._server.close()
+        self._server = None
+        return False
+
+    def send(self, msg):
+        """Send a message over the open connection"""
+        self._server.send_message(msg)
 
-    logger.info("Preparing change notification email")
 
-    # Create message
+def build_change_message(changes: dict, recipients: list, sender: str):
+    """Create the change notification email message"""
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
     msg = MIMEMultipart('alternative')
-    msg['From'] = smtp_config['sender']
+    msg['From'] = sender
     msg['To'] = ', '.join(recipients)
     msg['Subject'] = f"🔔 CCMHA Schedule Alert - Changes Detected at Amherst Stadium"
 
@@ -169,17 +100,20 @@ def send_change_notification(changes: dict, recipients: list, smtp_config: dict)
     html_part = MIMEText(html_content, 'html')
     msg.attach(html_part)
 
-    # Send email
-    try:
-        logger.info(f"Connecting to {smtp_config['server']}:{smtp_config['port']}")
-        with smtplib.SMTP(smtp_config['server'], smtp_config['port']) as server:
-            server.starttls()
+    return msg
 
-            logger.info("Logging in to SMTP server...")
-            server.login(smtp_config['sender'], smtp_config['password'])
 
+def send_change_notification(changes: dict, recipients: list, smtp_config: dict):
+    """Send email notification about schedule changes"""
+
+    logger.info("Preparing change notification email")
+    msg = build_change_message(changes, recipients, smtp_config['sender'])
+
+    # Send email
+    try:
+        with Notifier(smtp_config) as notifier:
             logger.info("Sending change notification...")
-            server.send_message(msg)
+            notifier.send(msg)
 
         logger.info("✓ Change notification sent successfully!")
         return True
@@ -189,8 +123,8 @@ def send_change_notification(changes: dict, recipients: list, smtp_config: dict)
         return False
 
 
-def main():
-    """Main execution function"""
+def main() -> int:
+    """Main execution function, returns the process exit code"""
     logger.info("="*60)
     logger.info("CCMHA Schedule Change Notifier")
     logger.info("="*60)
@@ -212,11 +146,11 @@ def main():
 
     if not recipients:
         logger.error("No recipients configured")
-        sys.exit(1)
+        return 1
 
     if not smtp_config['sender'] or not smtp_config['password']:
         logger.error("Email credentials not configured")
-        sys.exit(1)
+        return 1
 
     logger.info(f"Recipients: {len(recipients)}")
 
@@ -224,11 +158,11 @@ def main():
     changes = load_changes(changes_json)
     if not changes:
         logger.error("No changes data found")
-        sys.exit(1)
+        return 1
 
     if not changes.get('has_changes'):
         logger.info("No changes to notify about")
-        sys.exit(0)
+        return 0
 
     # Send notification
     success = send_change_notification(changes, recipients, smtp_config)
@@ -240,14 +174,19 @@ def main():
             logger.info("Cleaned up changes file")
         except:
             pass
-        sys.exit(0)
+        return 0
     else:
-        sys.exit(1)
+        return 1
 
 
-if __name__ == "__main__":
+def run() -> int:
+    """Run the notifier and return its exit code"""
     try:
-        main()
+        return main()
     except Exception as e:
         logger.error(f"Change notifier failed: {e}", exc_info=True)
-        sys.exit(1)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
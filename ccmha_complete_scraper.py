@@ -6,12 +6,20 @@ Uses Master Schedule API to get games, practices, and all ice times
 
 import os
 import sys
+import csv
 import json
 import logging
 import requests
-from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
 from typing import List, Dict
-import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib json module
+    orjson = None
 
 logging.basicConfig(
     level=logging.INFO,
@@ -31,32 +39,117 @@ SCHEDULE_TYPES = {
     7: 'Game'
 }
 
+# Conditional-GET cache files, kept in the scraper's cache_dir
+API_CACHE_FILE = 'api_cache.json'
+ETAG_FILE = '.api_etag'
+LAST_MODIFIED_FILE = '.api_last_modified'
+
+# Column order of the schedule CSV
+CSV_COLUMNS = ['date', 'start_time', 'end_time', 'type', 'league', 'team', 'venue']
+
 
 class CCMHACompleteScraper:
     """Scraper for ALL ice times at Amherst Stadium"""
 
-    def __init__(self, base_url: str = "https://ccmha.grayjayleagues.com"):
+    def __init__(self, base_url: str = "https://ccmha.grayjayleagues.com", cache_dir: str = None):
         self.base_url = base_url
+        # When set, the raw API response is cached here and revalidated with a conditional GET
+        self.cache_dir = cache_dir
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36'
         })
 
-    def get_all_schedule(self, days_ahead: int = 14) -> List[Dict]:
-        """Fetch complete schedule including games, practices, everything"""
-        logger.info(f"Fetching complete schedule for next {days_ahead} days")
-
+        # Keep-alive connection pool, retrying transient gateway errors with backoff.
+        # 3 attempts x 30 s timeout plus ~1 s backoff keeps a stalled API under
+        # 2 minutes; Retry-After is ignored since it could extend that without limit.
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=10,
+            max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=[502, 503, 504],
+                              respect_retry_after_header=False)
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def master_schedule_url(self) -> str:
+        """Master schedule API URL covering ALL schedule types"""
+        return (f"{self.base_url}/api/teams/frontendMasterSchedule/"
+                f"?true=1&team_id=0&league_id=0"
+                f"&schedule_types=7,1,2,3,4,6,5"  # All types
+                f"&season_id=0&show_past=0")
+
+    def _cache_path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def _read_cache_text(self, name: str) -> str:
         try:
-            # Use master schedule API with ALL schedule types
-            url = (f"{self.base_url}/api/teams/frontendMasterSchedule/"
-                   f"?true=1&team_id=0&league_id=0"
-                   f"&schedule_types=7,1,2,3,4,6,5"  # All types
-                   f"&season_id=0&show_past=0")
-
-            response = self.session.get(url, timeout=30)
+            with open(self._cache_path(name)) as f:
+                return f.read().strip()
+        except OSError:
+            return ''
+
+    def _write_cache(self, name: str, data: bytes):
+        """Write a cache file via a temp file so a reader never sees a partial write"""
+        path = self._cache_path(name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _conditional_headers(self) -> Dict:
+        """If-None-Match / If-Modified-Since headers for the cached response, if any"""
+        if not self.cache_dir or not os.path.exists(self._cache_path(API_CACHE_FILE)):
+            return {}
+
+        headers = {}
+        etag = self._read_cache_text(ETAG_FILE)
+        if etag:
+            headers['If-None-Match'] = etag
+        last_modified = self._read_cache_text(LAST_MODIFIED_FILE)
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def _save_to_cache(self, response: requests.Response):
+        """Persist the response body and its validators for the next run"""
+        try:
+            # Body first: validators must never point at a body we failed to write
+            self._write_cache(API_CACHE_FILE, response.content)
+            self._write_cache(ETAG_FILE, response.headers.get('ETag', '').encode())
+            self._write_cache(LAST_MODIFIED_FILE, response.headers.get('Last-Modified', '').encode())
+        except OSError as e:
+            logger.warning(f"Could not write API cache in {self.cache_dir}: {e}")
+
+    def fetch_master_schedule(self) -> Dict:
+        """Fetch and decode the raw master schedule API response
+
+        With a cache_dir, an unchanged schedule (304 Not Modified) is read
+        from the cached copy instead of being downloaded again.
+        """
+        response = self.session.get(self.master_schedule_url(),
+                                    headers=self._conditional_headers(), timeout=30)
+
+        if response.status_code == 304:
+            logger.info("Master schedule not modified, using cached response")
+            with open(self._cache_path(API_CACHE_FILE), 'rb') as f:
+                content = f.read()
+        else:
             response.raise_for_status()
+            content = response.content
+            if self.cache_dir:
+                self._save_to_cache(response)
+
+        if orjson is not None:
+            return orjson.loads(content)
+        return json.loads(content)
+
+    def get_all_schedule(self) -> List[Dict]:
+        """Fetch complete schedule including games, practices, everything"""
+        logger.info("Fetching complete schedule")
 
-            data = response.json()
+        try:
+            data = self.fetch_master_schedule()
 
             if data.get('status') != 'success':
                 logger.error(f"API returned non-success status: {data.get('status')}")
@@ -64,25 +157,7 @@ class CCMHACompleteScraper:
 
             items = data.get('data', [])
             logger.info(f"API returned {len(items)} total schedule items")
-
-            # Filter by date range
-            today = datetime.now().date()
-            end_date = today + timedelta(days=days_ahead)
-
-            filtered_items = []
-            for item in items:
-                # Check both team_schedule_date (practices) and game_date (games)
-                date_str = item.get('team_schedule_date') or item.get('game_date')
-                if date_str:
-                    try:
-                        item_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                        if today <= item_date <= end_date:
-                            filtered_items.append(item)
-                    except ValueError:
-                        logger.warning(f"Could not parse date: {date_str}")
-
-            logger.info(f"Filtered to {len(filtered_items)} items in date range")
-            return filtered_items
+            return items
 
         except requests.RequestException as e:
             logger.error(f"API request failed: {e}")
@@ -91,26 +166,34 @@ class CCMHACompleteScraper:
             logger.error(f"Error fetching schedule: {e}", exc_info=True)
             return []
 
-    def filter_by_venue(self, items: List[Dict], venue_filter: str = "Amherst Stadium") -> List[Dict]:
-        """Filter items by venue name"""
-        logger.info(f"Filtering for venue: {venue_filter}")
+    def format_items(self, items: List[Dict], today: str, end_date: str,
+                     venue_filter: str = "Amherst Stadium") -> List[Dict]:
+        """Filter raw API items by venue and date range and format them in one pass
 
-        filtered = []
-        for item in items:
-            venue_name = item.get('venue_name')
-            if venue_name and venue_filter.lower() in venue_name.lower():
-                filtered.append(item)
-
-        logger.info(f"Found {len(filtered)} items at {venue_filter}")
-        return filtered
+        today and end_date are inclusive ISO YYYY-MM-DD bounds; ISO dates
+        order correctly as strings.
+        """
+        venue_lower = venue_filter.lower()
 
-    def format_items(self, items: List[Dict]) -> List[Dict]:
-        """Format API response into simplified structure"""
-        # First, separate games and non-games to handle duplicates
+        # Separate games and non-games to handle duplicates
         games = []
         non_games = []
 
         for item in items:
+            venue_name = item.get('venue_name')
+            if not venue_name or venue_lower not in venue_name.lower():
+                continue
+
+            # Check both team_schedule_date (practices) and game_date (games)
+            date_str = item.get('team_schedule_date') or item.get('game_date')
+            if not date_str:
+                continue
+            if len(date_str) != 10:
+                logger.warning(f"Could not parse date: {date_str}")
+                continue
+            if not today <= date_str <= end_date:
+                continue
+
             # Check if this is a game or practice/other schedule item
             if 'game_id' in item:
                 # This is a GAME - use game fields
@@ -125,7 +208,7 @@ class CCMHACompleteScraper:
                     'type': 'Game',
                     'league': item.get('league_name', ''),
                     'team': team_display,
-                    'venue': item.get('venue_name', ''),
+                    'venue': venue_name,
                 }
                 games.append(formatted_item)
             else:
@@ -140,55 +223,60 @@ class CCMHACompleteScraper:
                     'type': type_name,
                     'league': item.get('league_name', ''),
                     'team': item.get('team_name', ''),
-                    'venue': item.get('venue_name', ''),
+                    'venue': venue_name,
                 }
                 non_games.append(formatted_item)
 
-        # Create a set of game time slots (date + start_time)
-        game_slots = {(g['date'], g['start_time']) for g in games}
+        # Game time slots (date + start_time)
+        game_slots = frozenset((g['date'], g['start_time']) for g in games)
+        game_count = len(games)
 
-        # Filter out non-games that conflict with game slots
-        # (The API returns duplicate entries for games)
-        non_games_filtered = [
+        # Append non-games that don't conflict with game slots straight onto
+        # the games list (the API returns duplicate entries for games)
+        all_items = games
+        all_items.extend(
             ng for ng in non_games
             if (ng['date'], ng['start_time']) not in game_slots
-        ]
+        )
+        kept_non_games = len(all_items) - game_count
 
-        # Combine and sort
-        all_items = games + non_games_filtered
-        all_items.sort(key=lambda x: (x['date'], x['start_time']))
+        # Sort
+        all_items.sort(key=itemgetter('date', 'start_time'))
 
-        logger.info(f"Found {len(games)} games, {len(non_games_filtered)} practices/other (removed {len(non_games) - len(non_games_filtered)} duplicates)")
+        logger.info(f"Found {len(all_items)} items at {venue_filter} between {today} and {end_date}")
+        logger.info(f"Found {game_count} games, {kept_non_games} practices/other (removed {len(non_games) - kept_non_games} duplicates)")
 
         return all_items
 
 
 def save_to_csv(items: List[Dict], filename: str):
     """Save items to CSV file"""
-    if not items:
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(items)
+
+    if items:
+        logger.info(f"Saved {len(items)} items to {filename}")
+    else:
         logger.warning("No items to save")
-        df = pd.DataFrame(columns=[
-            'date', 'start_time', 'end_time', 'type', 'league', 'team', 'venue'
-        ])
-        df.to_csv(filename, index=False)
         logger.info(f"Created empty CSV file: {filename}")
-        return
-
-    df = pd.DataFrame(items)
-    df.to_csv(filename, index=False)
-    logger.info(f"Saved {len(items)} items to {filename}")
 
-def save_to_json(items: List[Dict], filename: str, days_ahead: int, venue_filter: str, timezone: str):
+def save_to_json(items: List[Dict], filename: str, days_ahead: int, venue_filter: str, timezone_name: str):
     """Save items to JSON for display clients"""
     payload = {
-        'generated_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
-        'timezone': timezone,
+        'generated_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'timezone': timezone_name,
         'venue_filter': venue_filter,
         'days_ahead': days_ahead,
         'items': items
     }
-    with open(filename, 'w') as f:
-        json.dump(payload, f, indent=2)
+    if orjson is not None:
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2))
+    else:
+        with open(filename, 'w') as f:
+            json.dump(payload, f, indent=2)
     logger.info(f"Saved JSON output to {filename}")
 
 
@@ -213,21 +301,22 @@ def main():
     logger.info(f"Venue filter: {VENUE_FILTER}")
 
     # Scrape using Master Schedule API
-    scraper = CCMHACompleteScraper()
+    scraper = CCMHACompleteScraper(cache_dir=OUTPUT_DIR)
 
     # Get all schedule items
-    all_items = scraper.get_all_schedule(DAYS_AHEAD)
+    all_items = scraper.get_all_schedule()
 
     if not all_items:
         logger.warning("No schedule items found")
         save_to_csv([], OUTPUT_FILE)
         return []
 
-    # Filter by venue
-    venue_items = scraper.filter_by_venue(all_items, VENUE_FILTER)
-
-    # Format the items
-    formatted_items = scraper.format_items(venue_items)
+    # Filter by venue and date range, then format
+    today = datetime.now().date()
+    formatted_items = scraper.format_items(
+        all_items, today.isoformat(),
+        (today + timedelta(days=DAYS_AHEAD)).isoformat(), VENUE_FILTER
+    )
 
     # Save to CSV
     save_to_csv(formatted_items, OUTPUT_FILE)
@@ -237,18 +326,25 @@ def main():
     logger.info("="*60)
     logger.info(f"SUMMARY: Found {len(formatted_items)} ice times at {VENUE_FILTER}")
     if formatted_items:
-        logger.info("Ice Times:")
-        for item in formatted_items:
-            logger.info(f"  {item['date']} {item['start_time']}-{item['end_time']} | {item['type']} | {item['league']} | {item['team']}")
+        # One log record for the whole list rather than one per item
+        logger.info("Ice Times:\n" + "\n".join(
+            f"  {item['date']} {item['start_time']}-{item['end_time']} | {item['type']} | {item['league']} | {item['team']}"
+            for item in formatted_items
+        ))
     logger.info("="*60)
 
     return formatted_items
 
 
-if __name__ == "__main__":
+def run() -> int:
+    """Run the scraper and return its exit code"""
     try:
-        items = main()
-        sys.exit(0)
+        main()
+        return 0
     except Exception as e:
         logger.error(f"Scraper failed: {e}", exc_info=True)
-        sys.exit(1)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,14 @@
+"""
+CCMHA Schedule CSV Helpers
+Shared by the change detector and the weekly email notifier
+"""
+
+
+def csv_has_rows(filepath: str) -> bool:
+    """Check whether a CSV file exists and has at least one data row"""
+    try:
+        with open(filepath, 'rb') as f:
+            f.readline()
+            return any(line.strip() for line in f)
+    except OSError:
+        return False
@@ -9,16 +9,19 @@ Email notification script for CCMHA Schedule (Improved)
 
 import os
 import sys
+import io
 import smtplib
 import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
+from email.mime.application import MIMEApplication
 from datetime import datetime
-from typing import List, Dict
+from html import escape
+from typing import List, Dict, Iterable, Iterator, Optional
 import csv
 
+from ccmha_csv import csv_has_rows
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -26,6 +29,49 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# One row of the complete schedule table, filled by _row_cells()
+ROW_TMPL = """
+                    <tr>
+                        <td>{date}</td>
+                        <td>{time}</td>
+                        <td>{type}</td>
+                        <td>{league}</td>
+                        <td>{team}</td>
+                        <td>{venue}</td>
+                    </tr>
+            """
+
+# Shown in place of a missing column
+ROW_DEFAULTS = {'date': 'TBA', 'type': 'N/A', 'league': 'N/A', 'team': 'TBA', 'venue': 'N/A'}
+
+
+def _trim_seconds(value: str) -> str:
+    """Clean up time format (remove seconds if present)"""
+    if value and ':' in value:
+        return ':'.join(value.split(':')[:2])
+    return value
+
+
+def _time_display(game: Dict) -> str:
+    """Format a game's start and end time nicely"""
+    start_time = _trim_seconds(game.get('start_time', 'TBA'))
+    end_time = _trim_seconds(game.get('end_time', ''))
+    if end_time:
+        return f"{start_time} - {end_time}"
+    return f"{start_time}"
+
+
+def _cell(value) -> str:
+    """HTML-escape a table cell value"""
+    return escape(str(value), quote=False)
+
+
+def _row_cells(game: Dict) -> Dict:
+    """Escaped ROW_TMPL fields for a game, with defaults for missing columns"""
+    cells = {name: _cell(game.get(name, default)) for name, default in ROW_DEFAULTS.items()}
+    cells['time'] = _cell(_time_display(game))
+    return cells
+
 
 class EmailNotifier:
     """Handle email notifications for schedule updates"""
@@ -37,10 +83,48 @@ class EmailNotifier:
         self.sender_email = sender_email
         self.sender_password = sender_password
         self.test_mode = test_mode
+        self._smtp = None
+        self._keep_open = False
 
         if test_mode:
             logger.info("TEST MODE: Emails will not be sent")
 
+    def __enter__(self):
+        # The SMTP connection is opened lazily by the first send_email and
+        # then reused by later sends until the with-block exits
+        self._keep_open = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._keep_open = False
+        self.close()
+        return False
+
+    def _connection(self) -> smtplib.SMTP:
+        """Return the open SMTP connection, connecting and logging in if needed"""
+        if self._smtp is None:
+            logger.info(f"Connecting to {self.smtp_server}:{self.smtp_port}")
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+            try:
+                server.starttls()
+                logger.info("Logging in to SMTP server...")
+                server.login(self.sender_email, self.sender_password)
+            except Exception:
+                server.close()
+                raise
+            self._smtp = server
+        return self._smtp
+
+    def close(self):
+        """Close the SMTP connection if one is open"""
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
+
     def analyze_schedule(self, games: List[Dict]) -> Dict:
         """Analyze schedule for staffing and daily breakdown"""
         from collections import defaultdict
@@ -94,8 +178,11 @@ class EmailNotifier:
             'total_days': len(daily_games)
         }
 
-    def create_html_report(self, games: List[Dict]) -> str:
-        """Create an HTML email report from games data"""
+    def create_html_report(self, games: Iterable[Dict]) -> str:
+        """Create an HTML email report from games data (any iterable of rows)"""
+
+        # Sort games by date and time; this is the only copy of the rows kept
+        games = sorted(games, key=lambda x: (x.get('date', ''), x.get('start_time', '')))
 
         if not games:
             return """
@@ -132,13 +219,14 @@ class EmailNotifier:
             """
 
         # Build daily breakdown with time blocks
-        daily_breakdown_html = "<h3>📅 Weekly Schedule Overview</h3><div class='daily-breakdown'>"
+        daily_breakdown = io.StringIO()
+        daily_breakdown.write("<h3>📅 Weekly Schedule Overview</h3><div class='daily-breakdown'>")
         for date in sorted(analysis['daily_time_blocks'].keys()):
             time_block = analysis['daily_time_blocks'][date]
             game_count = time_block['game_count']
             staff_needed = "2 STAFF" if game_count >= 2 else "1 staff"
 
-            daily_breakdown_html += f"""
+            daily_breakdown.write(f"""
             <div class="day-section">
                 <div class="day-header">
                     <strong>{date}</strong>
@@ -149,12 +237,13 @@ class EmailNotifier:
                     <span class="staff-badge {'multi-staff' if game_count >= 2 else ''}">{staff_needed}</span>
                 </div>
             </div>
-            """
+            """)
 
-        daily_breakdown_html += "</div>"
+        daily_breakdown.write("</div>")
 
         # Start HTML
-        html = """
+        buf = io.StringIO()
+        buf.write("""
         <html>
         <head>
             <style>
@@ -271,38 +360,11 @@ class EmailNotifier:
             game_count=len(games),
             total_days=analysis['total_days'],
             staffing_alert=staffing_html,
-            daily_breakdown=daily_breakdown_html
-        )
-
-        # Sort games by date and time before displaying
-        sorted_games = sorted(games, key=lambda x: (x.get('date', ''), x.get('start_time', '')))
+            daily_breakdown=daily_breakdown.getvalue()
+        ))
 
         # Add game rows
-        for game in sorted_games:
-            # Format time nicely
-            start_time = game.get('start_time', 'TBA')
-            end_time = game.get('end_time', '')
-
-            # Clean up time format (remove seconds if present)
-            if start_time and ':' in start_time:
-                start_time = ':'.join(start_time.split(':')[:2])
-            if end_time and ':' in end_time:
-                end_time = ':'.join(end_time.split(':')[:2])
-
-            time_display = f"{start_time}"
-            if end_time:
-                time_display = f"{start_time} - {end_time}"
-
-            html += f"""
-                    <tr>
-                        <td>{game.get('date', 'TBA')}</td>
-                        <td>{time_display}</td>
-                        <td>{game.get('type', 'N/A')}</td>
-                        <td>{game.get('league', 'N/A')}</td>
-                        <td>{game.get('team', 'TBA')}</td>
-                        <td>{game.get('venue', 'N/A')}</td>
-                    </tr>
-            """
+        buf.write(''.join([ROW_TMPL.format_map(_row_cells(game)) for game in games]))
 
         # Close HTML
         test_mode_banner = ""
@@ -313,7 +375,7 @@ class EmailNotifier:
             </div>
             """
 
-        html += """
+        buf.write("""
                 </tbody>
             </table>
 
@@ -330,9 +392,9 @@ class EmailNotifier:
         """.format(
             timestamp=datetime.now().strftime('%Y-%m-%d %H:%M'),
             test_mode_banner=test_mode_banner
-        )
+        ))
 
-        return html
+        return buf.getvalue()
 
     def send_email(self, recipient_emails: List[str],
                    subject: str, html_content: str,
@@ -346,26 +408,24 @@ class EmailNotifier:
             logger.info(f"Subject: {subject}")
             logger.info(f"Attachment: {attachment_path}")
             logger.info("="*60)
-            # Still create the email for validation
-            msg = self._create_message(recipient_emails, subject, html_content, attachment_path)
+            # Still create the email for validation (the attachment is never sent, so skip encoding it)
+            self._create_message(recipient_emails, subject, html_content)
             logger.info("Email created successfully (not sent in test mode)")
             return True
 
         logger.info(f"Preparing email to {len(recipient_emails)} recipient(s)")
 
+        sent = False
         try:
             msg = self._create_message(recipient_emails, subject, html_content, attachment_path)
 
-            # Connect to SMTP server and send
-            logger.info(f"Connecting to {self.smtp_server}:{self.smtp_port}")
-            with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30) as server:
-                server.starttls()
-                logger.info("Logging in to SMTP server...")
-                server.login(self.sender_email, self.sender_password)
-                logger.info("Sending email...")
-                server.send_message(msg)
+            # Connect to SMTP server (or reuse the open connection) and send
+            server = self._connection()
+            logger.info("Sending email...")
+            server.send_message(msg)
 
             logger.info("Email sent successfully!")
+            sent = True
             return True
 
         except smtplib.SMTPAuthenticationError:
@@ -377,6 +437,10 @@ class EmailNotifier:
         except Exception as e:
             logger.error(f"Failed to send email: {e}", exc_info=True)
             return False
+        finally:
+            # Outside a with-block, or after a failure, don't leave the connection open
+            if not (sent and self._keep_open):
+                self.close()
 
     def _create_message(self, recipient_emails: List[str],
                        subject: str, html_content: str,
@@ -391,43 +455,42 @@ class EmailNotifier:
         html_part = MIMEText(html_content, 'html')
         msg.attach(html_part)
 
-        # Attach CSV file if provided
-        if attachment_path and os.path.exists(attachment_path):
+        # Attach CSV file if provided and it has data rows (a header-only CSV is just noise)
+        if attachment_path and not csv_has_rows(attachment_path):
+            logger.info(f"Skipping attachment with no schedule rows: {attachment_path}")
+        elif attachment_path:
             try:
                 with open(attachment_path, 'rb') as f:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(f.read())
-                    encoders.encode_base64(part)
-                    part.add_header(
-                        'Content-Disposition',
-                        f'attachment; filename={os.path.basename(attachment_path)}'
-                    )
-                    msg.attach(part)
-                    logger.info(f"Attached file: {attachment_path}")
+                    part = MIMEApplication(f.read())
+                part.add_header(
+                    'Content-Disposition',
+                    f'attachment; filename={os.path.basename(attachment_path)}'
+                )
+                msg.attach(part)
+                logger.info(f"Attached file: {attachment_path}")
             except Exception as e:
                 logger.warning(f"Failed to attach file {attachment_path}: {e}")
 
         return msg
 
 
-def load_games_from_csv(csv_file: str) -> List[Dict]:
-    """Load games data from CSV file"""
-    games = []
+def load_games_from_csv(csv_file: str) -> Iterator[Dict]:
+    """Stream games data from CSV file, one row at a time"""
+    count = 0
     try:
         if not os.path.exists(csv_file):
             logger.error(f"CSV file not found: {csv_file}")
-            return games
+            return
 
-        with open(csv_file, 'r') as f:
-            reader = csv.DictReader(f)
-            games = list(reader)
+        with open(csv_file, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                count += 1
+                yield row
 
-        logger.info(f"Loaded {len(games)} games from {csv_file}")
+        logger.info(f"Loaded {count} games from {csv_file}")
     except Exception as e:
         logger.error(f"Error loading CSV: {e}", exc_info=True)
 
-    return games
-
 
 def validate_email_config() -> bool:
     """Validate email configuration"""
@@ -441,8 +504,12 @@ def validate_email_config() -> bool:
     return True
 
 
-def main():
-    """Main execution function"""
+def main(items: Optional[List[Dict]] = None):
+    """Main execution function
+
+    items are the scraper's formatted items when called in-process; when
+    omitted they are loaded from the scraper's CSV.
+    """
     logger.info("="*60)
     logger.info("Starting CCMHA Email Notification (Improved)")
     logger.info("="*60)
@@ -472,8 +539,12 @@ def main():
     logger.info(f"CSV file: {CSV_FILE}")
     logger.info(f"Recipients: {len(RECIPIENT_EMAILS)}")
 
-    # Load games from CSV
-    games = load_games_from_csv(CSV_FILE)
+    # Load games from CSV unless the scraper handed them over directly
+    if items is None:
+        games = load_games_from_csv(CSV_FILE)
+    else:
+        # Match the CSV round trip, which writes missing (None) API fields as ''
+        games = ({k: '' if v is None else v for k, v in item.items()} for item in items)
 
     # Create email notifier
     notifier = EmailNotifier(
@@ -495,12 +566,13 @@ def main():
         subject = f"[TEST] {subject}"
 
     # Send email
-    success = notifier.send_email(
-        recipient_emails=RECIPIENT_EMAILS,
-        subject=subject,
-        html_content=html_content,
-        attachment_path=CSV_FILE if os.path.exists(CSV_FILE) else None
-    )
+    with notifier:
+        success = notifier.send_email(
+            recipient_emails=RECIPIENT_EMAILS,
+            subject=subject,
+            html_content=html_content,
+            attachment_path=CSV_FILE if os.path.exists(CSV_FILE) else None
+        )
 
     logger.info("="*60)
     if success:
@@ -0,0 +1,156 @@
+"""
+CCMHA Schedule Change HTML Rendering
+Shared by the change detector and the change email notifier
+"""
+
+from datetime import datetime
+from operator import itemgetter
+from typing import Dict
+
+STYLESHEET = """
+    <html>
+    <head>
+        <style>
+            body { font-family: Arial, sans-serif; }
+            h2 { color: #333; }
+            h3 { margin-top: 20px; }
+            table { border-collapse: collapse; width: 100%; margin-top: 10px; }
+            th { background-color: #4CAF50; color: white; padding: 8px; text-align: left; }
+            td { border: 1px solid #ddd; padding: 8px; }
+            tr:nth-child(even) { background-color: #f2f2f2; }
+            .added { background-color: #d4edda; }
+            .removed { background-color: #f8d7da; }
+            .modified { background-color: #fff3cd; }
+        </style>
+    </head>
+    <body>
+    """
+
+FOOTER = """
+    <p style='margin-top: 30px; color: #666; font-size: 12px;'>
+    This is an automated notification from the CCMHA Schedule Monitor.
+    Changes are checked at 12:30 PM, 4:30 PM, and 1:00 AM daily for the next 7 days.
+    </p>
+    </body>
+    </html>
+    """
+
+INLINE_TABLE = "<table border='1' cellpadding='5' cellspacing='0' style='border-collapse: collapse;'>"
+
+ITEM_COLUMNS = "<th>Date</th><th>Time</th><th>Type</th><th>League</th><th>Team</th><th>Venue</th>"
+CHANGE_COLUMNS = "<th>Date</th><th>Time</th><th>Type</th><th>League</th><th>Changes</th>"
+
+
+def _open_table(parts: list, heading: str, header_bg: str, columns: str, inline_styles: bool):
+    """Append a section heading, the table tag and its header row"""
+    parts.append(heading)
+    if inline_styles:
+        parts.append(INLINE_TABLE)
+        parts.append(f"<tr style='background-color: {header_bg}; color: white;'>{columns}</tr>")
+    else:
+        parts.append("<table>")
+        parts.append(f"<tr>{columns}</tr>")
+
+
+def _close_table(parts: list, inline_styles: bool):
+    parts.append("</table><br>" if inline_styles else "</table>")
+
+
+def _row_open(row_class: str, inline_styles: bool) -> str:
+    return "<tr>" if inline_styles else f"<tr class='{row_class}'>"
+
+
+def _render_item_table(parts: list, items: list, heading: str, header_bg: str,
+                       row_class: str, inline_styles: bool):
+    """Append a table of added or removed items, sorted by date and time"""
+    _open_table(parts, heading, header_bg, ITEM_COLUMNS, inline_styles)
+    tr = _row_open(row_class, inline_styles)
+    for item in sorted(items, key=itemgetter('date', 'start_time')):
+        parts.append(f"{tr}<td>{item['date']}</td><td>{item['start_time']} - {item['end_time']}</td>"
+                     f"<td>{item['type']}</td><td>{item['league']}</td>"
+                     f"<td>{item['team']}</td><td>{item['venue']}</td></tr>")
+    _close_table(parts, inline_styles)
+
+
+def _modified_pair(mod) -> tuple:
+    """Return (old, new) from a detector tuple or a serialized JSON entry"""
+    if isinstance(mod, dict):
+        return mod['old'], mod['new']
+    _, old_item, new_item = mod
+    return old_item, new_item
+
+
+def render_changes_html(changes: Dict, *, inline_styles: bool = True,
+                        include_html_wrapper: bool = False) -> str:
+    """Format changes into HTML for email
+
+    inline_styles puts table styling on the elements themselves (for
+    fragments embedded elsewhere); otherwise rows carry added/removed/
+    modified classes for the stylesheet. include_html_wrapper adds the
+    full document with stylesheet, detection time, summary box and footer.
+    """
+
+    if not changes or not changes.get('has_changes'):
+        return "<p>No changes detected in the next 7 days.</p>"
+
+    parts = []
+    if include_html_wrapper:
+        parts.append(STYLESHEET)
+        parts.append("<h2>🔔 CCMHA Schedule Changes Detected (Next 7 Days)</h2>")
+        parts.append(f"<p><strong>Detected at:</strong> {datetime.now().strftime('%Y-%m-%d %I:%M %p')}</p>")
+    else:
+        parts.append("<h2>Schedule Changes Detected (Next 7 Days)</h2>")
+
+    if changes.get('added'):
+        _render_item_table(parts, changes['added'], "<h3 style='color: green;'>➕ New Ice Times Added</h3>",
+                           '#4CAF50', 'added', inline_styles)
+
+    if changes.get('removed'):
+        _render_item_table(parts, changes['removed'], "<h3 style='color: red;'>➖ Ice Times Cancelled/Removed</h3>",
+                           '#f44336', 'removed', inline_styles)
+
+    # Modified items
+    if changes.get('modified'):
+        _open_table(parts, "<h3 style='color: orange;'>🔄 Ice Times Modified</h3>",
+                    '#FF9800', CHANGE_COLUMNS, inline_styles)
+
+        tr = _row_open('modified', inline_styles)
+        for mod in changes['modified']:
+            old_item, new_item = _modified_pair(mod)
+
+            # Describe changes
+            changes_desc = []
+            if old_item.get('team') != new_item.get('team'):
+                changes_desc.append(f"<strong>Team:</strong> {old_item.get('team')} → {new_item.get('team')}")
+            if old_item.get('end_time') != new_item.get('end_time'):
+                changes_desc.append(f"<strong>End:</strong> {old_item.get('end_time')} → {new_item.get('end_time')}")
+            if old_item.get('venue') != new_item.get('venue'):
+                changes_desc.append(f"<strong>Venue:</strong> {old_item.get('venue')} → {new_item.get('venue')}")
+
+            parts.append(f"{tr}<td>{new_item['date']}</td><td>{new_item['start_time']} - {new_item['end_time']}</td>"
+                         f"<td>{new_item['type']}</td><td>{new_item['league']}</td>"
+                         f"<td>{'<br>'.join(changes_desc)}</td></tr>")
+        _close_table(parts, inline_styles)
+
+    # Summary
+    added = len(changes.get('added', []))
+    removed = len(changes.get('removed', []))
+    modified = len(changes.get('modified', []))
+    if include_html_wrapper:
+        parts.append(f"""
+    <div style='margin-top: 30px; padding: 15px; background-color: #f0f0f0; border-left: 4px solid #4CAF50;'>
+        <h3 style='margin-top: 0;'>Summary</h3>
+        <ul>
+            <li><strong>{added}</strong> ice times added</li>
+            <li><strong>{removed}</strong> ice times removed</li>
+            <li><strong>{modified}</strong> ice times modified</li>
+        </ul>
+    </div>
+    """)
+        parts.append(FOOTER)
+    else:
+        parts.append(f"<p style='font-weight: bold;'>"
+                     f"Summary: {added} added, {removed} removed, {modified} modified"
+                     f"</p>")
+
+    return ''.join(parts)
@@ -4,11 +4,13 @@ CCMHA Schedule Monitor - Combined Script (Improved)
 Orchestrates scraping and email notification
 """
 
-import subprocess
 import sys
 import os
 import logging
-from pathlib import Path
+from typing import Callable, Dict, List
+
+from ccmha_complete_scraper import main as scrape_main
+from ccmha_email_notifier_improved import main as notify_main
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,45 +20,26 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def run_script(script_path: str, script_name: str) -> bool:
-    """Run a Python script and return success status"""
+def run_step(step: Callable, step_name: str) -> bool:
+    """Run a workflow step in-process and return success status"""
+    logger.info(f"{'='*60}")
+    logger.info(f"Executing: {step_name}")
+    logger.info(f"{'='*60}")
+
     try:
-        logger.info(f"{'='*60}")
-        logger.info(f"Executing: {script_name}")
-        logger.info(f"{'='*60}")
-
-        # Pass environment variables to subprocess
-        env = os.environ.copy()
-
-        result = subprocess.run(
-            [sys.executable, script_path],
-            env=env,
-            capture_output=True,
-            text=True,
-            timeout=300  # 5 minute timeout
-        )
-
-        # Log output
-        if result.stdout:
-            logger.info(f"{script_name} output:\n{result.stdout}")
-
-        if result.stderr:
-            logger.warning(f"{script_name} stderr:\n{result.stderr}")
-
-        if result.returncode == 0:
-            logger.info(f"✓ {script_name} completed successfully")
-            return True
-        else:
-            logger.error(f"✗ {script_name} failed with exit code {result.returncode}")
+        step()
+    except SystemExit as e:
+        # The notifier reports its result through sys.exit()
+        if e.code not in (None, 0):
+            logger.error(f"✗ {step_name} failed with exit code {e.code}")
             return False
-
-    except subprocess.TimeoutExpired:
-        logger.error(f"✗ {script_name} timed out after 5 minutes")
-        return False
     except Exception as e:
-        logger.error(f"✗ {script_name} failed with exception: {e}", exc_info=True)
+        logger.error(f"✗ {step_name} failed with exception: {e}", exc_info=True)
         return False
 
+    logger.info(f"✓ {step_name} completed successfully")
+    return True
+
 
 def check_environment() -> bool:
     """Check if required environment variables are set"""
@@ -88,24 +71,6 @@ def main():
     if not env_ok:
         logger.warning("Environment check failed, but continuing...")
 
-    # Get script directory
-    script_dir = Path(__file__).parent
-
-    # Determine which scripts to use (prefer improved versions)
-    scraper_script = script_dir / 'ccmha_scraper_improved.py'
-    if not scraper_script.exists():
-        scraper_script = script_dir / 'ccmha_scraper.py'
-        logger.info("Using original scraper script")
-    else:
-        logger.info("Using improved scraper script")
-
-    email_script = script_dir / 'ccmha_email_notifier_improved.py'
-    if not email_script.exists():
-        email_script = script_dir / 'ccmha_email_notifier.py'
-        logger.info("Using original email script")
-    else:
-        logger.info("Using improved email script")
-
     success_count = 0
     total_steps = 2
 
@@ -114,7 +79,9 @@ def main():
     logger.info("Step 1/2: Scraping schedule...")
     logger.info(f"{'='*60}")
 
-    if run_script(str(scraper_script), "Scraper"):
+    # Keep the scraped items so the notifier doesn't re-read the CSV just written
+    scraped_items: List[Dict] = []
+    if run_step(lambda: scraped_items.extend(scrape_main()), "Scraper"):
         success_count += 1
     else:
         logger.error("Scraper failed. Aborting.")
@@ -125,7 +92,7 @@ def main():
     logger.info("Step 2/2: Sending email notification...")
     logger.info(f"{'='*60}")
 
-    if run_script(str(email_script), "Email Notifier"):
+    if run_step(lambda: notify_main(items=scraped_items), "Email Notifier"):
         success_count += 1
     else:
         logger.error("Email notification failed.")